@@ -1,8 +1,10 @@
 # backup_db.py
 import sqlite3
 import logging
-import shutil
+import threading
+import time
 from pathlib import Path
+from typing import Optional
 from datetime import datetime
 
 # Determine the directory of the current script
@@ -16,87 +18,105 @@ class BackupDB:
         # This is more for consistency if DB_DISK_PATH were in a subdirectory of SCRIPT_DIR
         DB_DISK_PATH.parent.mkdir(parents=True, exist_ok=True)
         
-        self.conn = sqlite3.connect(":memory:") # Continue using in-memory for operations
+        # Work directly on the on-disk database in WAL mode: each commit appends to the
+        # write-ahead log, so state survives a crash without dumping and reloading the
+        # whole table. Backups are recorded from the monitor's copy worker threads, so
+        # the connection is shared across threads behind _lock.
+        # isolation_level=None: the only transactions are the ones record_backup opens
+        # explicitly, so no commit() is issued for nothing.
+        self.conn = sqlite3.connect(DB_DISK_PATH, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL") # WAL stays consistent; only the last commits can be lost on power failure
+        self._lock = threading.Lock()
+        # Records are grouped into one transaction, committed by flush() (the monitor calls
+        # it once per scan cycle and when its copy workers go idle), or by record_backup
+        # once _flush_threshold records are waiting or the oldest is _flush_interval old.
+        self._uncommitted = 0
+        self._flush_threshold = 64
+        self._flush_interval = 1.0
+        self._pending_since = 0.0 # time.monotonic() of the first uncommitted record
+        self._closed = False
         self.init_schema()
-        self._loaded = False
-        if DB_DISK_PATH.exists():
-            self.load_from_disk()
-        else:
-            logging.info(f"Database file not found at {DB_DISK_PATH}, a new one will be created on save.")
+        logging.info(f"Opened backup state database: {DB_DISK_PATH}")
 
 
     def init_schema(self):
+        # size/mtime_ns fingerprint the source file as it was when backed up, so an
+        # unchanged file can be recognised from a stat() without re-hashing it.
         self.conn.execute("""
             CREATE TABLE IF NOT EXISTS backed_up_files (
                 path TEXT PRIMARY KEY,
                 md5 TEXT NOT NULL,
-                backed_up_at TEXT NOT NULL
+                backed_up_at TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER
             )
         """)
-        self.conn.commit()
+        # Databases created before the fingerprint columns existed get them added (NULL
+        # for old rows, which simply never match a fingerprint).
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(backed_up_files)")}
+        for column in ("size", "mtime_ns"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE backed_up_files ADD COLUMN {column} INTEGER")
+                logging.info(f"Added '{column}' column to backed_up_files.")
 
-    def load_from_disk(self):
+    def close(self):
+        # Commit anything outstanding, fold the WAL back into the main file so the
+        # database is a single self-contained file while the service is stopped.
         try:
-            # Connect directly to the on-disk database for loading
-            disk_conn = sqlite3.connect(DB_DISK_PATH)
-            with disk_conn:
-                # Efficiently dump the on-disk database to the in-memory database
-                for line in disk_conn.iterdump():
-                    # Prevent trying to execute "BEGIN IMMEDIATE;" or "COMMIT;" which can cause issues
-                    if 'COMMIT;' not in line and 'BEGIN IMMEDIATE;' not in line:
-                        try:
-                            self.conn.execute(line)
-                        except sqlite3.OperationalError as e:
-                            logging.debug(f"Skipping line during load due to operational error (likely harmless): {line} - {e}")
-            self.conn.commit() # Commit all loaded data to memory
-            disk_conn.close()
-            self._loaded = True
-            logging.info(f"Loaded backup state from disk: {DB_DISK_PATH}")
-        except Exception as e:
-            logging.error(f"Failed to load backup DB from disk ({DB_DISK_PATH}): {e}")
+            with self._lock:
+                if self._closed:
+                    return
+                self._closed = True
+                self._commit()
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self.conn.close()
+            logging.info(f"Closed backup state database: {DB_DISK_PATH}")
+        except sqlite3.Error as e:
+            logging.error(f"Failed to close backup DB ({DB_DISK_PATH}): {e}")
 
-    def save_to_disk(self):
-        # Save the in-memory database to a temporary file first, then replace the actual DB file
-        # This is safer and helps prevent DB corruption if the script is interrupted.
-        tmp_path = DB_DISK_PATH.with_suffix(DB_DISK_PATH.suffix + ".tmp")
+    def flush(self):
+        # Commit whatever record_backup has gathered so far; nothing to do once closed
         try:
-            # Connect to the temporary on-disk database
-            disk_conn = sqlite3.connect(tmp_path)
-            with disk_conn:
-                # Dump the in-memory database to the temporary on-disk database
-                for line in self.conn.iterdump():
-                    disk_conn.execute(line)
-            disk_conn.commit() # Commit all data to the temporary file
-            disk_conn.close()
-            
-            # Replace the actual database file with the temporary one
-            shutil.move(tmp_path, DB_DISK_PATH)
-            logging.info(f"Saved backup state to disk: {DB_DISK_PATH}")
-        except Exception as e:
-            logging.error(f"Failed to save backup DB to disk ({DB_DISK_PATH}): {e}")
-            if tmp_path.exists():
-                try:
-                    tmp_path.unlink() # Attempt to clean up the temporary file on failure
-                except OSError as oe:
-                    logging.error(f"Could not remove temporary database file {tmp_path}: {oe}")
-        finally:
-            # Ensure temporary file is removed if it still exists for some reason (e.g. shutil.move failed before unlink)
-            if tmp_path.exists():
-                try:
-                    tmp_path.unlink()
-                except OSError: # nosemgrep: general-exception-escape
-                    pass # If it still can't be removed, log and move on.
+            with self._lock:
+                if not self._closed:
+                    self._commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to commit to backup DB ({DB_DISK_PATH}): {e}")
 
-    def record_backup(self, path: str, md5: str):
-        self.conn.execute(
-            "REPLACE INTO backed_up_files (path, md5, backed_up_at) VALUES (?, ?, ?)",
-            (path, md5, datetime.utcnow().isoformat())
-        )
-        self.conn.commit()
+    def _commit(self):
+        # Caller holds _lock
+        if self.conn.in_transaction:
+            self.conn.execute("COMMIT")
+        self._uncommitted = 0
 
-    def is_already_backed_up(self, path: str, md5: str) -> bool:
-        cur = self.conn.execute(
-            "SELECT 1 FROM backed_up_files WHERE path = ? AND md5 = ?",
-            (path, md5)
-        )
-        return cur.fetchone() is not None
\ No newline at end of file
+    def record_backup(self, path: str, md5: str, size: Optional[int] = None, mtime_ns: Optional[int] = None):
+        with self._lock:
+            if not self.conn.in_transaction:
+                # First record of a new group: take the write lock up front
+                self.conn.execute("BEGIN IMMEDIATE")
+                self._pending_since = time.monotonic()
+            self.conn.execute(
+                "REPLACE INTO backed_up_files (path, md5, backed_up_at, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                (path, md5, datetime.utcnow().isoformat(), size, mtime_ns)
+            )
+            self._uncommitted += 1
+            if (self._uncommitted >= self._flush_threshold
+                    or time.monotonic() - self._pending_since >= self._flush_interval):
+                self._commit()
+
+    def load_known_hashes(self) -> dict:
+        # path -> md5 for every recorded backup; path is the primary key, so a dict
+        # mirrors the table exactly (a REPLACE overwrites the old digest).
+        with self._lock:
+            return dict(self.conn.execute("SELECT path, md5 FROM backed_up_files"))
+
+    def load_fingerprints(self) -> dict:
+        # path -> (size, mtime_ns) of the source file at its last backup
+        with self._lock:
+            return {
+                path: (size, mtime_ns)
+                for path, size, mtime_ns in self.conn.execute(
+                    "SELECT path, size, mtime_ns FROM backed_up_files WHERE size IS NOT NULL AND mtime_ns IS NOT NULL"
+                )
+            }
@@ -1,7 +1,7 @@
 # config.py
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import configparser # For INI file handling
 import os # For expanding user paths like ~
 import logging
@@ -34,10 +34,11 @@ class Config:
     monitor_dir: Path
     dest_base_dir: Path
     dest_subdir_name: str
-    file_extensions: List[str]
+    file_extensions: Tuple[str, ...] # Tuple so it can be handed straight to str.endswith
     check_interval: int  # in seconds
     stable_threshold: int  # in seconds (total time file must be stable)
     categories_file_path: Path # Path to the file_type_presets.conf
+    parallel_hash_workers: int = 0 # Worker threads hashing/copying stable files concurrently (0 = one per CPU)
 
 # Global variable to hold loaded categories, initialized by get_config
 FILE_TYPE_CATEGORIES: Dict[str, List[str]] = {}
@@ -56,14 +57,19 @@ def save_categories_to_file(filepath: Path, categories: Dict[str, List[str]]):
         logging.error(f"Could not write categories file to {filepath}: {e}")
 
 
-def load_file_type_categories_from_file(filepath: Path) -> Dict[str, List[str]]:
+def load_file_type_categories_from_file(filepath: Path, create_if_missing: bool = True) -> Dict[str, List[str]]:
+    # With create_if_missing=False a missing file only yields the defaults in memory;
+    # setup.py uses this while prompting and writes the file once every answer is in.
     global FILE_TYPE_CATEGORIES
     loaded_categories: Dict[str, List[str]] = {}
     created_default = False
     if not filepath.exists():
-        logging.info(f"Categories file not found at {filepath}. Creating it with default categories.")
-        logging.info(f"You can edit this file ({filepath}) later to customize categories and extensions.")
-        save_categories_to_file(filepath, DEFAULT_FILE_TYPE_CATEGORIES)
+        if create_if_missing:
+            logging.info(f"Categories file not found at {filepath}. Creating it with default categories.")
+            logging.info(f"You can edit this file ({filepath}) later to customize categories and extensions.")
+            save_categories_to_file(filepath, DEFAULT_FILE_TYPE_CATEGORIES)
+        else:
+            logging.info(f"Categories file not found at {filepath}. Using default categories; it will be created when setup completes.")
         created_default = True
         loaded_categories = DEFAULT_FILE_TYPE_CATEGORIES.copy()
 
@@ -106,13 +112,13 @@ def load_file_type_categories_from_file(filepath: Path) -> Dict[str, List[str]]:
     return loaded_categories
 
 
-def get_extensions_interactively(current_config_extensions: Optional[List[str]] = None) -> List[str]:
+def get_extensions_interactively(current_config_extensions: Optional[Tuple[str, ...]] = None) -> List[str]:
     global FILE_TYPE_CATEGORIES
 
     if not FILE_TYPE_CATEGORIES:
         logging.warning("FILE_TYPE_CATEGORIES is not populated. Attempting to load/create now.")
         categories_path = CONFIG_SCRIPT_DIR / DEFAULT_CATEGORIES_FILENAME
-        load_file_type_categories_from_file(categories_path)
+        load_file_type_categories_from_file(categories_path, create_if_missing=False)
         if not FILE_TYPE_CATEGORIES:
             logging.error("Failed to load or create any file type categories. Manual text input for extensions will be required if questionary is not used.")
 
@@ -297,7 +303,8 @@ def get_config_interactively(current_config: Optional[Config] = None) -> Config:
         default_val=default_categories_path_suggestion
     )
 
-    FILE_TYPE_CATEGORIES = load_file_type_categories_from_file(categories_file_path_interactive)
+    # Nothing is written while prompting: a cancelled setup leaves no files behind
+    FILE_TYPE_CATEGORIES = load_file_type_categories_from_file(categories_file_path_interactive, create_if_missing=False)
 
     logging.info("\n--- Configure File Extensions ---")
     extensions_from_old_config = current_config.file_extensions if current_config else None
@@ -338,7 +345,7 @@ def get_config_interactively(current_config: Optional[Config] = None) -> Config:
         monitor_dir=monitor_dir,
         dest_base_dir=dest_base_dir,
         dest_subdir_name=dest_subdir_name,
-        file_extensions=file_extensions_list,
+        file_extensions=tuple(file_extensions_list),
         check_interval=int(check_interval_min_str) * 60,
         stable_threshold=int(stable_threshold_min_str) * 60,
         categories_file_path=categories_file_path_interactive
@@ -381,7 +388,7 @@ def load_config_from_ini(ini_path: Path) -> Optional[Config]:
 
         # Settings section
         extensions_str = get_mandatory_ini_value('Settings', 'file_extensions')
-        file_extensions = [ext.strip() for ext in extensions_str.split(',') if ext.strip().startswith('.') and len(ext.strip()) > 1]
+        file_extensions = tuple(ext.strip() for ext in extensions_str.split(',') if ext.strip().startswith('.') and len(ext.strip()) > 1)
         if not file_extensions:
             logging.error(f"INI Error: No valid 'file_extensions' found in {ini_path}.")
             raise ValueError("No valid file_extensions in INI file.")
@@ -397,6 +404,12 @@ def load_config_from_ini(ini_path: Path) -> Optional[Config]:
         check_interval_minutes = int(check_interval_minutes_str)
         stable_threshold_minutes = int(stable_threshold_minutes_str)
 
+        # Optional: configs written before this setting existed get the automatic default
+        parallel_hash_workers_str = parser.get('Settings', 'parallel_hash_workers', fallback='0').strip()
+        if not parallel_hash_workers_str.isdigit():
+            raise ValueError("parallel_hash_workers must be a non-negative integer in INI (0 = one per CPU).")
+        parallel_hash_workers = int(parallel_hash_workers_str)
+
         # Presets section for categories_file
         raw_categories_file = get_mandatory_ini_value('Presets', 'categories_file')
         categories_file_p = Path(raw_categories_file)
@@ -412,7 +425,8 @@ def load_config_from_ini(ini_path: Path) -> Optional[Config]:
             file_extensions=file_extensions,
             check_interval=check_interval_minutes * 60,
             stable_threshold=stable_threshold_minutes * 60,
-            categories_file_path=categories_file_path
+            categories_file_path=categories_file_path,
+            parallel_hash_workers=parallel_hash_workers
         )
     except ValueError as ve:
         logging.error(f"Configuration error in {ini_path}: {ve}")
@@ -431,7 +445,8 @@ def save_config_to_ini(config: Config, ini_path: Path):
     parser['Settings'] = {
         'file_extensions': ','.join(config.file_extensions),
         'check_interval_minutes': str(config.check_interval // 60),
-        'stable_threshold_minutes': str(config.stable_threshold // 60)
+        'stable_threshold_minutes': str(config.stable_threshold // 60),
+        'parallel_hash_workers': str(config.parallel_hash_workers)
     }
 
     try:
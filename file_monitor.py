@@ -1,12 +1,170 @@
 # file_monitor.py
+import os
+import sys
 import time
+import errno
+import stat
 import shutil
 import logging
 from pathlib import Path
+from typing import Optional
 from config import Config # Assuming Config dataclass is defined here
 import hashlib
 from backup_db import BackupDB
 import threading # Required for type hinting the event
+from array import array
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # Not a Unix system: no FICLONE, copies use copy_file_range/shutil
+from concurrent.futures import ThreadPoolExecutor
+from inotify_watcher import (
+    InotifyWatcher, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE,
+    IN_DELETE_SELF, IN_MOVE_SELF, IN_UNMOUNT, IN_IGNORED, IN_Q_OVERFLOW, IN_ISDIR,
+)
+
+_WATCH_MASK = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_WATCH_LOST = IN_DELETE_SELF | IN_MOVE_SELF | IN_UNMOUNT | IN_IGNORED
+_FICLONE = 0x40049409 # _IOW(0x94, 9, int) from <linux/fs.h>
+_COPY_RANGE_CHUNK = 64 << 20 # bytes per copy_file_range call; shutdown is checked between calls
+
+
+# Destination directories already created by this process; a monitor constructed again
+# for the same destination skips the mkdir(parents=True) syscall chain.
+_ensured_dirs = set()
+
+
+class _CopyCancelled(Exception):
+    # Raised inside a copy worker when shutdown is requested mid-copy
+    pass
+
+
+class _TrackedFiles:
+    # Per-file monitoring state stored as parallel arrays (one column per field)
+    # instead of a small dict per tracked file. Row i of every column describes paths[i].
+    # Paths are plain (interned) strings: str hashes are cached, whereas every Path
+    # lookup goes through os.fspath and its own __hash__/__eq__.
+    __slots__ = ("paths", "last_size", "last_mtime_ns", "stable_since_ns", "hashers", "bytes_hashed", "_index")
+
+    def __init__(self):
+        self.paths = []
+        self.last_size = array("q")
+        self.last_mtime_ns = array("q")
+        self.stable_since_ns = array("q") # time.monotonic_ns() when (last_size, last_mtime_ns) last changed
+        self.hashers = [] # running MD5 of the first bytes_hashed bytes, None until first stable check
+        self.bytes_hashed = array("q")
+        self._index = {} # path -> row
+
+    def _columns(self):
+        return (self.paths, self.last_size, self.last_mtime_ns, self.stable_since_ns, self.hashers, self.bytes_hashed)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, filepath):
+        return filepath in self._index
+
+    def add(self, filepath, st, now_ns):
+        filepath = sys.intern(filepath)
+        self._index[filepath] = len(self.paths)
+        self.paths.append(filepath)
+        self.last_size.append(st.st_size)
+        self.last_mtime_ns.append(st.st_mtime_ns)
+        self.stable_since_ns.append(now_ns)
+        self.hashers.append(None)
+        self.bytes_hashed.append(0)
+
+    def discard(self, filepath):
+        row = self._index.get(filepath)
+        if row is not None:
+            self.discard_rows((row,))
+
+    def discard_rows(self, rows):
+        # Swap-remove, highest row first, so the rows still pending removal stay valid.
+        for row in sorted(rows, reverse=True):
+            last = len(self.paths) - 1
+            del self._index[self.paths[row]]
+            if row != last:
+                for column in self._columns():
+                    column[row] = column[last]
+                self._index[self.paths[row]] = row
+            for column in self._columns():
+                column.pop()
+
+
+# Page-cache hints for the source of a copy; None where posix_fadvise is unavailable
+_FADV_SEQUENTIAL = getattr(os, "POSIX_FADV_SEQUENTIAL", None)
+_FADV_DONTNEED = getattr(os, "POSIX_FADV_DONTNEED", None)
+
+
+def _fadvise(fd, advice):
+    # Only a hint: skipped where unsupported and ignored if the kernel refuses it
+    if advice is None:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError:
+        pass
+
+
+_XATTR_IGNORED = {errno.ENOTSUP, errno.EPERM, errno.EINVAL, getattr(errno, "ENODATA", errno.ENOTSUP)}
+
+
+def _copy_metadata(fsrc, fdst, src, dst):
+    # shutil.copystat through the open descriptors: no path resolution per call, and the
+    # times are set after the last write so the backup keeps the source's mtime_ns.
+    if not hasattr(os, "fchmod") or os.utime not in os.supports_fd:
+        shutil.copystat(src, dst)
+        return
+    src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+    st = os.fstat(src_fd)
+    if hasattr(os, "listxattr"):
+        try:
+            names = os.listxattr(src_fd)
+        except OSError as e:
+            if e.errno not in _XATTR_IGNORED:
+                raise
+            names = []
+        for name in names:
+            try:
+                os.setxattr(dst_fd, name, os.getxattr(src_fd, name))
+            except OSError as e:
+                if e.errno not in _XATTR_IGNORED:
+                    raise
+    os.fchmod(dst_fd, stat.S_IMODE(st.st_mode))
+    os.utime(dst_fd, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def _new_md5():
+    # The digest only detects changed content, so usedforsecurity=False is accurate and
+    # lets OpenSSL 3 (including FIPS builds) hand out its fastest MD5 implementation.
+    return hashlib.new("md5", usedforsecurity=False)
+
+
+def _stable_step(sizes_new, mtimes_new, last_size, last_mtime_ns, stable_since_ns, now_ns, threshold_ns):
+    # One stability check over every tracked row: rows whose (size, mtime) moved restart
+    # their stable period at now_ns, rows that held for threshold_ns are ready. Negative
+    # sizes mark rows that could not be stat'ed and are left alone.
+    # Comparing mtime as well catches writers that rewrite a file in place without
+    # changing its length.
+    # Returns (steady, ready, changed): the unchanged rows, the subset of them that are
+    # ready, and (row, previous size) for every row that moved.
+    steady, ready, changed = [], [], []
+    for row, size in enumerate(sizes_new):
+        if size < 0:
+            continue
+        mtime_ns = mtimes_new[row]
+        if size == last_size[row] and mtime_ns == last_mtime_ns[row]:
+            steady.append(row)
+            if now_ns - stable_since_ns[row] >= threshold_ns:
+                ready.append(row)
+        else:
+            changed.append((row, last_size[row]))
+            last_size[row] = size
+            last_mtime_ns[row] = mtime_ns
+            stable_since_ns[row] = now_ns
+    return steady, ready, changed
+
 
 class CachedFileMonitor:
     # Modify __init__ to accept the shutdown_event
@@ -15,120 +173,536 @@ class CachedFileMonitor:
         self.shutdown_event = shutdown_event # Store the event
 
         self.monitor_dir = Path(self.config.monitor_dir)
+        self._monitor_dir_str = str(self.monitor_dir) # joined with event names to build tracked paths
         self.dest_base_dir = Path(self.config.dest_base_dir)
-        self.file_extensions = self.config.file_extensions
+        self.file_extensions = tuple(self.config.file_extensions)
+        # Normalised once so the per-entry extension test in scan_files is a single endswith call
+        self._ext_set = frozenset(e if e.startswith('.') else '.' + e for e in self.file_extensions)
+        self._matches = self._compile_matcher(self._ext_set)
         self.check_interval = self.config.check_interval  # This is the total check interval in seconds
         self.stable_threshold = self.config.stable_threshold
+        self.stable_threshold_ns = self.stable_threshold * 1_000_000_000
+
+        if type(_new_md5()).__module__ != "_hashlib":
+            logging.warning("Python's hashlib is not backed by OpenSSL; using the slower built-in MD5 implementation.")
 
         self.dest_dir = self.ensure_dest_dir(self.config.dest_subdir_name)
-        self.monitored_files = {}
+        self._dest_dir_str = str(self.dest_dir) # copy destinations are joined onto this string
+        self.monitored_files = _TrackedFiles()
         self.db = BackupDB()
+        # In-process copy of the DB's path -> md5 table. Every backup is recorded through
+        # _record, which updates both, so the dict is authoritative and a miss (the usual
+        # case, a new file) is answered without querying SQLite.
+        self._known = self.db.load_known_hashes()
+        # path -> (size, mtime_ns) of each source file when it was backed up; a file still
+        # matching its fingerprint is known to be backed up without reading it again
+        self._fingerprints = self.db.load_fingerprints()
+        # Hashing/copying a large file runs off the scan thread so new and growing files
+        # keep being tracked meanwhile. _inflight maps each submitted path to its future.
+        # hashlib and file I/O release the GIL, so several workers hash and copy in
+        # parallel when many files become stable in the same cycle.
+        self.copy_workers = self.config.parallel_hash_workers or os.cpu_count() or 4
+        # Cleared the first time the destination filesystem refuses a reflink clone
+        self._can_reflink = fcntl is not None and sys.platform.startswith("linux")
+        self._copy_pool = ThreadPoolExecutor(max_workers=self.copy_workers, thread_name_prefix="backup-copy")
+        self._inflight = {}
+        # Copies submitted and not yet done; the worker that brings it back to zero commits
+        # the records the batch made, so they do not wait for the next scan cycle
+        self._active_copies = 0
+        self._active_lock = threading.Lock()
+        # Set by a worker whose copy failed, so the scan loop wakes to re-track the file
+        self._copy_failed = threading.Event()
+        # Reused each cycle for entries to drop once iteration is over, instead of
+        # snapshotting the containers with list() so they can be mutated mid-loop
+        self._finished_rows = []
+        self._reaped = []
+        self._hash_buf = bytearray(1 << 20) # _hash_ahead reads into this (scan thread only)
 
-    def compute_md5(self, filepath: Path, chunk_size: int = 8192) -> str:
-        # ... (same as before)
-        hash_md5 = hashlib.md5()
+        # With inotify the directory is only listed at startup (and after an event queue
+        # overflow); afterwards events drive tracking and only tracked files are stat'ed.
         try:
-            with filepath.open("rb") as f:
-                for chunk in iter(lambda: f.read(chunk_size), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
-        except Exception as e:
+            self._watcher = InotifyWatcher(self.monitor_dir, _WATCH_MASK)
+        except OSError as e:
+            logging.warning(f"inotify unavailable ({e}); falling back to polling {self.monitor_dir} every {self.check_interval} seconds.")
+            self._watcher = None
+
+    def compute_md5(self, filepath: str) -> Optional[str]:
+        # One-shot digest of a file nothing else is reading (copy_stable_file's destination
+        # match); None if it cannot be read. Takes the same path strings as the rest of
+        # the tracking code (a Path also works).
+        try:
+            with open(filepath, "rb", buffering=0) as f:
+                # A streaming read: widen readahead, and drop the pages afterwards rather
+                # than letting a multi-GB file push the producer's data out of the cache
+                _fadvise(f.fileno(), _FADV_SEQUENTIAL)
+                try:
+                    if hasattr(hashlib, "file_digest"):
+                        # Python 3.11+: hashlib's own readinto() loop over a reused 256 KiB buffer
+                        # (plain Python, but no bytes object per chunk; update() drops the GIL)
+                        return hashlib.file_digest(f, _new_md5).hexdigest()
+                    # Older Pythons: the same readinto() loop as _hash_ahead. Not mmap: a
+                    # producer truncating the file mid-hash would kill the process with SIGBUS.
+                    hash_md5 = _new_md5()
+                    view = memoryview(bytearray(1 << 20)) # own buffer: runs on copy workers
+                    while n := f.readinto(view):
+                        hash_md5.update(view[:n])
+                    return hash_md5.hexdigest()
+                finally:
+                    _fadvise(f.fileno(), _FADV_DONTNEED)
+        except OSError as e:
             logging.error(f"Failed to compute MD5 for {filepath}: {e}")
-            return ""
+            return None
 
     def ensure_dest_dir(self, subdir_name):
-        # ... (same as before)
         dest_path = self.dest_base_dir / subdir_name
+        key = str(dest_path)
+        if key in _ensured_dirs:
+            return dest_path
         try:
             dest_path.mkdir(parents=True, exist_ok=True)
+            _ensured_dirs.add(key)
             logging.info(f"Ensured destination directory exists: {dest_path}")
             return dest_path
         except OSError as e:
             logging.error(f"Could not create destination directory {dest_path}: {e}")
             raise
 
-    def get_file_size(self, filepath):
-        # ... (same as before)
+    def get_file_stat(self, filepath):
         try:
-            return filepath.stat().st_size
+            return os.stat(filepath)
         except FileNotFoundError:
             return None
         except OSError as e:
-            logging.error(f"Error getting size for {filepath}: {e}")
+            logging.error(f"Error getting file status for {filepath}: {e}")
             return None
 
+    @staticmethod
+    def _compile_matcher(ext_set):
+        # Specialise the filename filter for the configured extensions once. For a short
+        # list, str.endswith takes a tuple and checks every suffix in C. A long list (e.g.
+        # several preset categories selected in setup) is bucketed by suffix length
+        # instead: one slice and one hashed set lookup per distinct length, however many
+        # extensions share that length.
+        suffixes = tuple(ext_set)
+        if len(suffixes) <= 8:
+            return lambda name: name.endswith(suffixes)
+        by_length = {}
+        for suffix in suffixes:
+            by_length.setdefault(len(suffix), set()).add(suffix)
+        buckets = tuple((-length, frozenset(group)) for length, group in sorted(by_length.items()))
+        return lambda name: any(name[start:] in group for start, group in buckets)
+
     def scan_files(self):
-        # ... (same as before)
+        # Returns {path str: os.stat_result}. scandir already knows the entry type from the
+        # directory listing, and the one stat() per matching file is reused by both handlers.
+        current_files = {}
         try:
-            return {
-                f for f in self.monitor_dir.iterdir()
-                if f.is_file() and f.suffix in self.file_extensions
-            }
+            with os.scandir(self._monitor_dir_str) as it:
+                for entry in it:
+                    if not self._matches(entry.name) or not entry.is_file():
+                        continue
+                    try:
+                        current_files[entry.path] = entry.stat()
+                    except OSError as e:
+                        logging.debug("Could not stat %s during scan: %s", entry.path, e)
         except OSError as e:
             logging.error(f"Error listing directory {self.monitor_dir}: {e}")
-            return set()
+            return {}
+        return current_files
+
+    def stat_tracked_files(self):
+        # Same {path: os.stat_result} shape as scan_files, restricted to the tracked files.
+        current_files = {}
+        for filepath in self.monitored_files.paths:
+            st = self.get_file_stat(filepath)
+            if st is not None:
+                current_files[filepath] = st
+        return current_files
 
     def handle_existing_files(self, current_files):
-        # ... (same as before)
-        for filepath in list(self.monitored_files):
-            if self.shutdown_event.is_set(): break # Check event during long loops
-            if filepath not in current_files:
+        tracked = self.monitored_files
+        last_size = tracked.last_size
+        last_mtime_ns = tracked.last_mtime_ns
+        stable_since_ns = tracked.stable_since_ns
+        now_ns = time.monotonic_ns()
+        # Collect every tracked file's size and mtime first, then run the stability
+        # arithmetic in one pass.
+        sizes_new = array("q", last_size)
+        mtimes_new = array("q", last_mtime_ns)
+        finished_rows = self._finished_rows
+        finished_rows.clear()
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG) # checked once, not per file
+        for row, filepath in enumerate(tracked.paths):
+            if self.shutdown_event.is_set(): return # Check event during long loops
+            # Stat results come from the scan (or stat_tracked_files), so no second stat()
+            # here; a live stat is only needed if the file was missed by the scan.
+            st = current_files.get(filepath)
+            if st is None:
+                st = self.get_file_stat(filepath)
+            if st is None:
                 logging.warning(f"Tracked file disappeared: {filepath}. Removing from tracking.")
-                self.monitored_files.pop(filepath, None)
-                continue
-            current_size = self.get_file_size(filepath)
-            if current_size is None:
-                logging.warning(f"Could not get size for {filepath}. Removing from tracking.")
-                self.monitored_files.pop(filepath, None)
+                sizes_new[row] = -1
+                finished_rows.append(row)
                 continue
-            file_info = self.monitored_files[filepath]
-            if current_size == file_info['last_size']:
-                file_info['stable_checks'] += 1
-                logging.debug(f"{filepath} size stable at {current_size}. Checks: {file_info['stable_checks']}")
-                if file_info['stable_checks'] * self.check_interval >= self.stable_threshold: # Assuming check_interval here is the "granularity of checks" not the sleep time
-                                                                                              # If self.check_interval is the main loop sleep, this logic might need adjustment
-                                                                                              # Or, rather, stable_checks * (time_per_check which is 1s here)
-                    self.copy_stable_file(filepath)
+            sizes_new[row] = st.st_size
+            mtimes_new[row] = st.st_mtime_ns
+
+        steady, ready, changed = _stable_step(sizes_new, mtimes_new, last_size, last_mtime_ns, stable_since_ns, now_ns, self.stable_threshold_ns)
+        paths = tracked.paths
+        for row, old_size in changed:
+            # Growth does not prove an append (a writer may also patch earlier bytes), so
+            # any change invalidates the running hash
+            tracked.hashers[row] = None
+            logging.info(f"{paths[row]} changed (size {old_size} -> {last_size[row]}). Restarting stability timer.")
+        for row in steady:
+            if self.shutdown_event.is_set(): return
+            if debug:
+                logging.debug("%s size stable at %d. Stable for %ds", paths[row], last_size[row], (now_ns - stable_since_ns[row]) // 1_000_000_000)
+            self._hash_ahead(row, paths[row], last_size[row])
+
+        for row in ready:
+            if self.shutdown_event.is_set(): break
+            hasher = tracked.hashers[row]
+            if hasher is not None and tracked.bytes_hashed[row] == last_size[row]:
+                # The digest is only valid for the (size, mtime) that was hashed; the worker
+                # re-checks it against its own stat before trusting it.
+                file_md5, hashed = hasher.hexdigest(), (last_size[row], last_mtime_ns[row])
             else:
-                logging.info(f"{filepath} size changed from {file_info['last_size']} to {current_size}. Resetting checks.")
-                self.monitored_files[filepath] = {'last_size': current_size, 'stable_checks': 0}
+                file_md5, hashed = None, None
+            if self._submit_copy(paths[row], file_md5, hashed):
+                finished_rows.append(row)
+        # Rows are only removed once the loops are done so the indices above stay stable.
+        tracked.discard_rows(finished_rows)
 
 
     def handle_new_files(self, current_files):
-        # ... (same as before)
-        for filepath in current_files:
+        now_ns = time.monotonic_ns()
+        for filepath, st in current_files.items():
             if self.shutdown_event.is_set(): break # Check event
-            if filepath not in self.monitored_files:
-                current_size = self.get_file_size(filepath)
-                if current_size is not None:
-                    logging.info(f"Detected new file: {filepath} (Size: {current_size}). Starting monitoring.")
-                    self.monitored_files[filepath] = {'last_size': current_size, 'stable_checks': 0}
-                else:
-                    logging.warning(f"Detected new file {filepath}, but could not get size. Skipping for now.")
+            if filepath not in self.monitored_files and not self._copy_pending(filepath):
+                if self._unchanged_since_backup(filepath, st):
+                    # e.g. every already backed-up file seen by the startup scan
+                    logging.debug("%s unchanged since its last backup; not monitoring.", filepath)
+                    continue
+                logging.info(f"Detected new file: {filepath} (Size: {st.st_size}). Starting monitoring.")
+                self.monitored_files.add(filepath, st, now_ns)
 
-    def copy_stable_file(self, filepath):
-        # ... (same as before, but you might want to add a self.shutdown_event.is_set() check if MD5 or copy is very long)
+    def handle_events(self, events):
+        # Apply inotify events to the tracking state. Returns True when a full directory
+        # scan is needed to catch up: the kernel's event queue overflowed, or the watch on
+        # monitor_dir was lost and had to be re-added.
+        rescan = watch_lost = False
+        now_ns = time.monotonic_ns()
+        for mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                logging.warning(f"inotify event queue overflowed for {self.monitor_dir}. Rescanning directory.")
+                rescan = True
+                continue
+            if mask & _WATCH_LOST:
+                watch_lost = True
+                continue
+            if mask & IN_ISDIR or not self._matches(name):
+                continue
+            filepath = os.path.join(self._monitor_dir_str, name)
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                if filepath in self.monitored_files:
+                    logging.info(f"Tracked file removed: {filepath}. Removing from tracking.")
+                    self.monitored_files.discard(filepath)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                # The writer closed the file (or it was renamed into place): it is complete,
+                # so back it up now instead of waiting out the stability threshold.
+                self.monitored_files.discard(filepath)
+                logging.info(f"{filepath} was closed after writing or moved in. Backing it up.")
+                if not self._submit_copy(filepath, None):
+                    # A copy of an older version is still running; re-check via stability.
+                    st = self.get_file_stat(filepath)
+                    if st is not None:
+                        self.monitored_files.add(filepath, st, now_ns)
+            elif mask & IN_CREATE:
+                if filepath not in self.monitored_files and not self._copy_pending(filepath):
+                    st = self.get_file_stat(filepath)
+                    if st is not None:
+                        logging.info(f"Detected new file: {filepath} (Size: {st.st_size}). Starting monitoring.")
+                        self.monitored_files.add(filepath, st, now_ns)
+        if watch_lost:
+            self._rewatch()
+            rescan = True
+        return rescan
+
+    def _rewatch(self):
+        # monitor_dir was deleted, moved or unmounted under the watch. Watch the path again
+        # (it may have been recreated already); if that is not possible, poll it instead,
+        # as scan_files copes with the directory coming and going.
+        logging.warning(f"inotify watch on {self.monitor_dir} was lost. Watching it again and rescanning.")
         try:
-            file_md5 = self.compute_md5(filepath)
-            if self.shutdown_event.is_set(): return # Check after potentially long operation
+            self._watcher.rewatch()
+        except OSError as e:
+            logging.warning(f"Could not watch {self.monitor_dir} again ({e}); falling back to polling it every {self.check_interval} seconds.")
+            watcher, self._watcher = self._watcher, None
+            watcher.close()
 
-            rel_path = str(filepath.relative_to(self.monitor_dir))
-            dest_path = self.dest_dir / filepath.name 
+    def _wait_for_events(self):
+        # Block on inotify until the next stability check is due; with nothing tracked
+        # there is nothing to re-check, so wait for events indefinitely.
+        # Returns True when a full rescan is needed.
+        deadline = time.monotonic() + self.check_interval
+        while not self.shutdown_event.is_set() and not self._copy_failed.is_set():
+            timeout = None
+            if len(self.monitored_files):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            if self.handle_events(self._watcher.read_events(timeout)):
+                # Events were lost (queue overflow or a lost watch), so rescan now rather
+                # than waiting (possibly indefinitely, with nothing tracked) for the next one
+                return True
+        return False
 
-            if self.db.is_already_backed_up(rel_path, file_md5):
-                logging.info(f"Skipped {filepath}; already backed up with same content.")
+    def _wake_on_shutdown(self):
+        self.shutdown_event.wait()
+        watcher = self._watcher
+        if watcher is not None: # None once run() has fallen back to polling
+            watcher.wake()
+
+    def _copy_pending(self, filepath):
+        future = self._inflight.get(filepath)
+        return future is not None and not future.done()
+
+    def _submit_copy(self, filepath, file_md5, hashed=None):
+        # Hand a file to the copy workers unless a copy of it is still pending.
+        if self._copy_pending(filepath):
+            logging.debug("Copy of %s still pending; not resubmitting yet.", filepath)
+            return False
+        with self._active_lock:
+            self._active_copies += 1
+        future = self._copy_pool.submit(self.copy_stable_file, filepath, file_md5, hashed)
+        future.add_done_callback(self._on_copy_done)
+        self._inflight[filepath] = future
+        return True
+
+    def _on_copy_done(self, future):
+        # Runs on the worker once the future is done. The last copy of a burst commits
+        # the batch; a failure wakes the scan loop so _reap_copies re-tracks the file
+        # without waiting for an unrelated event.
+        with self._active_lock:
+            self._active_copies -= 1
+            idle = self._active_copies == 0
+        if idle:
+            self.db.flush()
+        if future.cancelled():
+            return
+        if future.exception() is not None or future.result() is False:
+            self._copy_failed.set()
+            watcher = self._watcher
+            if watcher is not None:
+                watcher.wake()
+
+    def _reap_copies(self):
+        # Forget finished copies so their files can be picked up again on later scans.
+        # copy_stable_file logs its own errors; anything that still escaped is logged here.
+        # A failed copy (ENOSPC, EIO, ...) puts its file back under monitoring: with inotify
+        # nothing rescans the directory, so otherwise it would not be retried until restart.
+        self._copy_failed.clear()
+        reaped = self._reaped
+        reaped.clear()
+        now_ns = time.monotonic_ns()
+        for filepath, future in self._inflight.items():
+            if not future.done():
+                continue
+            reaped.append(filepath)
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                logging.error(f"Backup worker failed for {filepath}: {future.exception()}")
+            elif future.result() is not False:
+                continue
+            st = self.get_file_stat(filepath)
+            if st is not None and filepath not in self.monitored_files:
+                logging.info(f"Retrying backup of {filepath} once it has been stable for {self.stable_threshold} seconds.")
+                self.monitored_files.add(filepath, st, now_ns)
+        for filepath in reaped:
+            del self._inflight[filepath]
+
+    def _hash_ahead(self, row, filepath, current_size):
+        # Hash a file while it sits out its stability period, so that by the time it
+        # graduates its digest is already known. The hasher is dropped whenever the file
+        # changes, so it only ever covers one (size, mtime) version; a read cut short by
+        # shutdown resumes from bytes_hashed on the next check.
+        tracked = self.monitored_files
+        done = tracked.bytes_hashed[row]
+        if tracked.hashers[row] is None:
+            tracked.hashers[row] = _new_md5()
+            done = 0
+        elif done == current_size:
+            return # Already fully hashed; no need to open the file again
+        hasher = tracked.hashers[row]
+        view = memoryview(self._hash_buf)
+        try:
+            with open(filepath, "rb", buffering=0) as f:
+                _fadvise(f.fileno(), _FADV_SEQUENTIAL)
+                f.seek(done)
+                while done < current_size and not self.shutdown_event.is_set():
+                    n = f.readinto(view[:min(len(view), current_size - done)])
+                    if not n:
+                        break
+                    hasher.update(view[:n])
+                    done += n
+        except OSError as e:
+            logging.error(f"Failed to hash {filepath} incrementally: {e}")
+        finally:
+            tracked.bytes_hashed[row] = done
+
+    def _hash_and_copy(self, src: str, dst: str, chunk_size: int = 1 << 20) -> str:
+        # Single read pass: every chunk read from src feeds the hash and the
+        # destination write, so a new file is only read from disk once.
+        # One buffer per file, filled with readinto(): no new bytes object per chunk.
+        hash_md5 = _new_md5()
+        view = memoryview(bytearray(chunk_size))
+        with open(src, "rb", buffering=0) as fsrc, open(dst, "wb", buffering=0) as fdst:
+            # Larger readahead for the sequential read; once copied, the source's pages
+            # are dropped so a big backup does not push hotter data out of the cache.
+            _fadvise(fsrc.fileno(), _FADV_SEQUENTIAL)
+            while n := fsrc.readinto(view):
+                if self.shutdown_event.is_set(): raise _CopyCancelled()
+                chunk = view[:n]
+                hash_md5.update(chunk)
+                while chunk:
+                    chunk = chunk[fdst.write(chunk):]
+            _fadvise(fsrc.fileno(), _FADV_DONTNEED)
+            # Starts writeback of the copy now; its pages are dropped once clean
+            _fadvise(fdst.fileno(), _FADV_DONTNEED)
+            _copy_metadata(fsrc, fdst, src, dst)
+        return hash_md5.hexdigest()
+
+    def _fast_copy(self, src: str, dst: str):
+        # Copy with copy_file_range(2): the data never leaves the kernel, and filesystems
+        # that support it can reflink or copy server-side. Where it is unsupported (other
+        # OS, old kernel, cross-filesystem) fall back to shutil.copyfile, which itself
+        # uses sendfile(2) on Linux before resorting to a read/write loop.
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            if self._can_reflink and self._try_reflink(fsrc, fdst):
+                _copy_metadata(fsrc, fdst, src, dst)
                 return
+            copied = 0
+            try:
+                if not hasattr(os, "copy_file_range"):
+                    raise OSError(errno.ENOSYS, "copy_file_range is not available")
+                _fadvise(fsrc.fileno(), _FADV_SEQUENTIAL)
+                while True:
+                    if self.shutdown_event.is_set(): raise _CopyCancelled()
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), _COPY_RANGE_CHUNK)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError as e:
+                if copied or e.errno not in (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+                logging.debug("copy_file_range unavailable for %s (%s); using shutil.copyfile.", src, e)
+            else:
+                _fadvise(fsrc.fileno(), _FADV_DONTNEED)
+                _fadvise(fdst.fileno(), _FADV_DONTNEED)
+                _copy_metadata(fsrc, fdst, src, dst)
+                return
+        shutil.copyfile(src, dst)
+        shutil.copystat(src, dst)
+
+    def _try_reflink(self, fsrc, fdst):
+        # FICLONE shares the source's extents with the destination (Btrfs, XFS with
+        # reflink=1, ...), so the copy is O(1) whatever the file size. Filesystems that
+        # cannot do it say so on the first attempt, after which it is not tried again.
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            return True
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+                raise
+            logging.info(f"Reflink copies unavailable for {self.dest_dir} ({e}); using copy_file_range.")
+            self._can_reflink = False
+            return False
 
-            shutil.copy2(filepath, dest_path)
-            if self.shutdown_event.is_set(): return # Check after potentially long operation
+    def _unchanged_since_backup(self, filepath, st):
+        return self._fingerprints.get(os.path.basename(filepath)) == (st.st_size, st.st_mtime_ns)
 
-            self.db.record_backup(rel_path, file_md5)
+    def _already_at_dest(self, src, dest_path):
+        # Backups keep the source's mtime (_copy_metadata), so a destination with the same size
+        # and nanosecond mtime is this file already copied. Stable files are not being
+        # modified, which is what makes the cheap fingerprint sufficient.
+        try:
+            dst = os.stat(dest_path)
+        except FileNotFoundError:
+            return False
+        return src.st_size == dst.st_size and src.st_mtime_ns == dst.st_mtime_ns
+
+    def _record(self, rel_path, file_md5, st):
+        self.db.record_backup(rel_path, file_md5, st.st_size, st.st_mtime_ns)
+        self._known[rel_path] = file_md5
+        self._fingerprints[rel_path] = (st.st_size, st.st_mtime_ns)
+
+    def copy_stable_file(self, filepath, file_md5=None, hashed=None):
+        # file_md5 is the digest gathered while the file was proving stable, and hashed the
+        # (size, mtime_ns) it was computed for; without both (or if the file has changed
+        # since) the file is hashed while being copied. Either way the copy goes to a temporary
+        # name next to the destination and only replaces the final name once we know
+        # this content has not been backed up yet.
+        # Paths stay plain strings here too: os.path.join instead of PurePath operators.
+        rel_path = os.path.basename(filepath) # monitored files sit directly in monitor_dir
+        dest_path = os.path.join(self._dest_dir_str, rel_path)
+        tmp_path = dest_path + ".tmp"
+        try:
+            # Taken before any read, so the recorded fingerprint never postdates the data
+            st = os.stat(filepath)
+            if file_md5 is not None and hashed != (st.st_size, st.st_mtime_ns):
+                # Rewritten between graduating and reaching this worker: the digest
+                # describes the old content, so trusting it could skip the new one
+                logging.info(f"{filepath} changed since it was hashed; hashing it again while copying.")
+                file_md5 = None
+            if self._unchanged_since_backup(filepath, st):
+                logging.info(f"Skipped {filepath}; unchanged since its last backup.")
+                return
+            if self._already_at_dest(st, dest_path):
+                # e.g. copied just before a crash, ahead of its DB commit: no I/O needed
+                logging.info(f"Skipped {filepath}; {dest_path} already has the same size and mtime.")
+                if file_md5 is None:
+                    # Still worth one read of the source: without a record every restart
+                    # would come back here, and _known would not know this content
+                    file_md5 = self.compute_md5(filepath)
+                    if file_md5 is None:
+                        return False
+                    after = os.stat(filepath)
+                    if (after.st_size, after.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+                        # The digest may describe newer content than the destination holds
+                        logging.info(f"{filepath} changed while it was being hashed; it will be backed up again.")
+                        return False
+                self._record(rel_path, file_md5, st)
+                return
+
+            copied = file_md5 is None
+            if copied:
+                file_md5 = self._hash_and_copy(filepath, tmp_path)
+
+            if self._known.get(rel_path) == file_md5:
+                logging.info(f"Skipped {filepath}; already backed up with same content.")
+                # Only the fingerprint is new (e.g. touched without changing content)
+                self._record(rel_path, file_md5, st)
+                return
+
+            if not copied:
+                self._fast_copy(filepath, tmp_path)
+            os.replace(tmp_path, dest_path)
+            self._record(rel_path, file_md5, st)
             logging.info(f"Copied {filepath} to {dest_path}")
 
+        except _CopyCancelled:
+            logging.info(f"Copy of {filepath} interrupted by shutdown; it will be picked up again on the next start.")
         except Exception as e:
             logging.error(f"Error copying {filepath}: {e}")
+            return False # _reap_copies puts the file back under monitoring for a retry
         finally:
-            self.monitored_files.pop(filepath, None)
+            if os.path.exists(tmp_path):
+                try:
+                    os.unlink(tmp_path)
+                except OSError as oe:
+                    logging.error(f"Could not remove temporary file {tmp_path}: {oe}")
 
 
     def run(self):
@@ -139,28 +713,38 @@ class CachedFileMonitor:
         extensions_display_string = ", ".join(self.file_extensions)
         logging.info(f"Monitoring directory: {self.monitor_dir} for {extensions_display_string} files. Press Ctrl+C or send SIGTERM to stop.")
         
+        if self._watcher is not None:
+            # Turns a shutdown request into a wake-up of the blocking inotify read
+            threading.Thread(target=self._wake_on_shutdown, name="inotify-wake", daemon=True).start()
+
         try:
+            full_scan = True
             # Main loop, checks the shutdown_event
             while not self.shutdown_event.is_set():
-                logging.debug("Scanning directory...")
-                current_files = self.scan_files()
+                self._reap_copies()
+                if full_scan:
+                    logging.debug("Scanning directory...")
+                    current_files = self.scan_files()
+                else:
+                    current_files = self.stat_tracked_files()
                 if self.shutdown_event.is_set(): break
 
                 self.handle_existing_files(current_files)
+                self.db.flush() # records from copies finished during the cycle
                 if self.shutdown_event.is_set(): break
 
-                self.handle_new_files(current_files)
+                if full_scan:
+                    self.handle_new_files(current_files)
                 if self.shutdown_event.is_set(): break
                 
-                logging.debug(f"Scan cycle complete. Waiting for {self.check_interval} seconds or shutdown signal.")
-                # Sleep in small intervals to check the event frequently
-                # The total sleep time will be self.check_interval
-                for _ in range(self.check_interval):
+                logging.debug("Scan cycle complete. Waiting for %d seconds or shutdown signal.", self.check_interval)
+                if self._watcher is not None:
+                    full_scan = self._wait_for_events()
                     if self.shutdown_event.is_set():
+                        logging.info("Shutdown signal detected while waiting for file events. Exiting loop.")
                         break
-                    time.sleep(1) # Sleep 1 second at a time
-                
-                if self.shutdown_event.is_set():
+                # Block on the event itself; wait() returns True as soon as shutdown is signalled
+                elif self.shutdown_event.wait(timeout=self.check_interval):
                     logging.info("Shutdown signal detected during sleep interval. Exiting loop.")
                     break
         
@@ -169,6 +753,11 @@ class CachedFileMonitor:
             self.shutdown_event.set() # Ensure shutdown is triggered
         finally:
             # This block will execute when the loop terminates (due to event or exception)
-            logging.info("CachedFileMonitor run loop ending. Attempting to save database.")
-            self.db.save_to_disk()
+            # Let a copy that is already running finish, but drop the ones still queued.
+            self._copy_pool.shutdown(wait=True, cancel_futures=True)
+            self.db.flush()
+            if self._watcher is not None:
+                self._watcher.close()
+            logging.info("CachedFileMonitor run loop ending. Closing database.")
+            self.db.close()
             logging.info("CachedFileMonitor shutdown complete.")
\ No newline at end of file
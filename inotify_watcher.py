@@ -0,0 +1,142 @@
+# inotify_watcher.py
+import os
+import sys
+import select
+import struct
+import ctypes
+import logging
+import threading
+
+# Event bits from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000 # always reported, like the two below
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000 # the watch is gone (directory deleted, unmounted, or removed)
+IN_ISDIR = 0x40000000
+
+_EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len (name follows, NUL padded)
+_READ_SIZE = 64 * 1024
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _libc.inotify_init1.argtypes = [ctypes.c_int]
+    _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    _libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+except (OSError, AttributeError):
+    _libc = None # Not Linux (or no inotify in libc): callers fall back to polling
+
+
+class InotifyWatcher:
+    # Watches a single directory with inotify and blocks until events arrive.
+    # An eventfd (a pipe before Python 3.10) sits next to the inotify fd so wake() can
+    # interrupt read_events() from another thread (e.g. when shutdown is requested).
+    # Both are waited on with epoll, which unlike select() has no FD_SETSIZE ceiling.
+    # Raises OSError if inotify is not available on this system.
+
+    def __init__(self, directory, mask):
+        if _libc is None or not hasattr(select, "epoll"):
+            raise OSError("inotify is not available on this system")
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self._fd = fd
+        self._directory = directory
+        self._mask = mask
+        self._wd = -1
+        self._wake_fd = self._wake_write_fd = None
+        self._epoll = None
+        # wake() is called from other threads (shutdown bridge, copy workers) and must
+        # not write to an fd that close() has released, or whose number has been reused
+        self._lock = threading.Lock()
+        self._closed = False
+        try:
+            self._add_watch()
+            if hasattr(os, "eventfd"):
+                self._wake_fd = self._wake_write_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            else:
+                # os.pipe() fds are already non-inheritable, matching EFD_CLOEXEC
+                self._wake_fd, self._wake_write_fd = os.pipe()
+                os.set_blocking(self._wake_fd, False)
+                os.set_blocking(self._wake_write_fd, False)
+            self._epoll = select.epoll()
+            self._epoll.register(fd, select.EPOLLIN)
+            self._epoll.register(self._wake_fd, select.EPOLLIN)
+        except BaseException:
+            self.close()
+            raise
+
+    def _add_watch(self):
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(self._directory), self._mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch failed for {self._directory}: {os.strerror(err)}")
+        self._wd = wd
+
+    def rewatch(self):
+        # Watch the directory path again after its watch was lost (IN_IGNORED and friends),
+        # e.g. because it was deleted and recreated or remounted. The old watch is dropped
+        # first in case it still follows a directory that was moved away. Raises OSError
+        # if the path cannot be watched.
+        if self._wd >= 0:
+            _libc.inotify_rm_watch(self._fd, self._wd) # EINVAL if already gone; either way it is gone
+            self._wd = -1
+        self._add_watch()
+
+    def wake(self):
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                os.write(self._wake_write_fd, (1).to_bytes(8, sys.byteorder))
+            except BlockingIOError:
+                pass # Already signalled and not yet drained
+
+    def read_events(self, timeout=None):
+        # Returns a list of (mask, name) tuples; empty on timeout or wake(). Events still
+        # queued for a watch replaced by rewatch() are dropped.
+        ready = [fd for fd, _ in self._epoll.poll(-1 if timeout is None else timeout)]
+        if self._wake_fd in ready:
+            try:
+                os.read(self._wake_fd, _READ_SIZE)
+            except BlockingIOError:
+                pass
+        if self._fd not in ready:
+            return []
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if wd != self._wd and not mask & IN_Q_OVERFLOW: # an overflow has wd -1
+                continue
+            events.append((mask, os.fsdecode(name)))
+        logging.debug("inotify delivered %d event(s)", len(events))
+        return events
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._epoll is not None:
+                self._epoll.close()
+            for fd in {self._fd, self._wake_fd, self._wake_write_fd} - {None}:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
@@ -146,6 +146,7 @@ def main():
     logger.info(f"  Check Interval: {app_config.check_interval // 60} minutes ({app_config.check_interval} seconds)")
     logger.info(f"  Stable Threshold: {app_config.stable_threshold // 60} minutes ({app_config.stable_threshold} seconds)")
     logger.info(f"  Categories File Path: {app_config.categories_file_path}")
+    logger.info(f"  Parallel Hash Workers: {app_config.parallel_hash_workers or 'one per CPU'}")
     logger.info("---------------------------------------------------------------------")
 
     try:
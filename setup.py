@@ -8,7 +8,9 @@ try:
     from config import (
         get_config_interactively,
         save_config_to_ini,
+        save_categories_to_file,
         DEFAULT_CONFIG_INI_PATH,
+        DEFAULT_FILE_TYPE_CATEGORIES,
         load_config_from_ini,
         Config, # Import Config for type hinting
         questionary # To check if available
@@ -23,7 +25,9 @@ except ImportError as e:
         from config import (
             get_config_interactively,
             save_config_to_ini,
+            save_categories_to_file,
             DEFAULT_CONFIG_INI_PATH,
+            DEFAULT_FILE_TYPE_CATEGORIES,
             load_config_from_ini,
             Config,
             questionary
@@ -94,6 +98,10 @@ def run_setup():
         # The hints should come from the prompt text itself or validation messages.
         new_config = get_config_interactively(current_config=None) # Explicitly pass None
 
+        # All prompting is done; only now touch the filesystem
+        if not new_config.categories_file_path.exists():
+            logging.info(f"Creating file type categories file with default categories: {new_config.categories_file_path}")
+            save_categories_to_file(new_config.categories_file_path, DEFAULT_FILE_TYPE_CATEGORIES)
         save_config_to_ini(new_config, DEFAULT_CONFIG_INI_PATH)
         logging.info(f"Configuration successfully saved to: {DEFAULT_CONFIG_INI_PATH}")
         logging.info("---------------------------------------------------------------------")